@@ -4,15 +4,37 @@ Handles input from Sound Blaster USB dongle and extracts musical features.
 """
 
 import os
+import re
+import math
 import numpy as np
-import librosa
 import sounddevice as sd
 import threading
 import time
-from collections import deque
+from collections.abc import Mapping
 from scipy import signal
+from scipy.fft import rfft, next_fast_len
 import logging
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    import pyfftw
+    PYFFTW_AVAILABLE = True
+except ImportError:
+    PYFFTW_AVAILABLE = False
+
+# librosa is only needed for the optional 'librosa' beat method; the default
+# spectral-flux detector runs entirely on the shared per-hop FFT
+try:
+    import librosa
+    LIBROSA_AVAILABLE = True
+except ImportError:
+    LIBROSA_AVAILABLE = False
+
 # Configure environment for better audio compatibility on Raspberry Pi
 try:
     # Try to disable PulseAudio backend for sounddevice
@@ -26,6 +48,179 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
+if NUMBA_AVAILABLE:
+    @njit(cache=True, nogil=True, fastmath=True)
+    def _window_energy(frame, window, out, start):
+        """Write frame * window into out and return the sum of squares of frame[start:], in one pass."""
+        for i in range(start):
+            out[i] = frame[i] * window[i]
+        total = 0.0
+        for i in range(start, frame.shape[0]):
+            sample = frame[i]
+            total += sample * sample
+            out[i] = sample * window[i]
+        return total
+    
+    @njit(cache=True, nogil=True, fastmath=True)
+    def _spectrum_features(spectrum, log_mag, prev_log_mag, scratch, gain,
+                           band_bins, band_scale, alpha, band_sums, band_powers):
+        """One pass over a hop's spectrum: log-magnitude flux and smoothed band powers.
+        
+        Writes log1p(gain * |X|) into log_mag, folds each band's mean power into
+        band_powers with an exponential average of weight alpha, and returns the
+        half-wave rectified flux against prev_log_mag (scratch unused).
+        """
+        band_sums[:] = 0.0
+        flux = 0.0
+        for i in range(spectrum.shape[0]):
+            real = spectrum[i].real
+            imag = spectrum[i].imag
+            power = real * real + imag * imag
+            for b in range(band_bins.shape[0]):
+                if band_bins[b, 0] <= i < band_bins[b, 1]:
+                    band_sums[b] += power
+            level = math.log1p(gain * math.sqrt(power))
+            log_mag[i] = level
+            diff = level - prev_log_mag[i]
+            if diff > 0.0:
+                flux += diff
+        for b in range(band_bins.shape[0]):
+            band_powers[b] += alpha * (band_sums[b] * band_scale[b] - band_powers[b])
+        return flux
+    
+    @njit(cache=True, nogil=True)
+    def _onset_strength(env, norm_len, pre_max, pre_avg, threshold):
+        """Causal peak test on the newest envelope value.
+        
+        Returns its strength normalized to the last norm_len values, or -1.0
+        if it is not a local max over pre_max values that also clears the
+        pre_avg mean by threshold times the recent range.
+        """
+        n = env.shape[0]
+        value = env[n - 1]
+        low = value
+        high = value
+        for i in range(n - norm_len, n):
+            if env[i] < low:
+                low = env[i]
+            elif env[i] > high:
+                high = env[i]
+        spread = high - low
+        if spread <= 1e-9:
+            return -1.0
+        for i in range(n - 1 - pre_max, n - 1):
+            if env[i] > value:
+                return -1.0
+        total = 0.0
+        for i in range(n - 1 - pre_avg, n - 1):
+            total += env[i]
+        if value < total / pre_avg + threshold * spread:
+            return -1.0
+        return (value - low) / spread
+    
+    @njit(cache=True, nogil=True)
+    def _mean_beat_interval(times):
+        """Mean gap between consecutive beat times, ignoring gaps outside 0.5-2x the upper median.
+        
+        Returns 0.0 when fewer than two times are given or no gap survives.
+        """
+        n = times.shape[0] - 1
+        if n < 1:
+            return 0.0
+        intervals = np.empty(n)
+        for i in range(n):
+            intervals[i] = times[i + 1] - times[i]
+        
+        # Insertion sort a copy (at most 7 values) for the upper median
+        ordered = intervals.copy()
+        for i in range(1, n):
+            value = ordered[i]
+            j = i - 1
+            while j >= 0 and ordered[j] > value:
+                ordered[j + 1] = ordered[j]
+                j -= 1
+            ordered[j + 1] = value
+        median = ordered[n // 2]
+        
+        total = 0.0
+        count = 0
+        for i in range(n):
+            if median * 0.5 < intervals[i] < median * 2.0:
+                total += intervals[i]
+                count += 1
+        return total / count if count else 0.0
+else:
+    def _window_energy(frame, window, out, start):
+        """Write frame * window into out and return the sum of squares of frame[start:]."""
+        np.multiply(frame, window, out=out)
+        tail = frame[start:]
+        return float(np.dot(tail, tail))
+    
+    def _spectrum_features(spectrum, log_mag, prev_log_mag, scratch, gain,
+                           band_bins, band_scale, alpha, band_sums, band_powers):
+        """Log-magnitude flux and smoothed band powers for one hop's spectrum.
+        
+        Writes log1p(gain * |X|) into log_mag, folds each band's mean power into
+        band_powers with an exponential average of weight alpha, and returns the
+        half-wave rectified flux against prev_log_mag (scratch is workspace).
+        """
+        # Power spectrum |X|^2 = real^2 + imag^2 in one pass
+        parts = spectrum.view(np.float32).reshape(-1, 2)
+        power = np.einsum('ij,ij->i', parts, parts, out=scratch)
+        for b in range(band_bins.shape[0]):
+            band_sums[b] = power[band_bins[b, 0]:band_bins[b, 1]].sum()
+        
+        np.sqrt(power, out=log_mag)
+        log_mag *= gain
+        np.log1p(log_mag, out=log_mag)
+        diff = np.subtract(log_mag, prev_log_mag, out=scratch)
+        flux = float(np.maximum(diff, 0.0, out=diff).sum())
+        
+        band_sums *= band_scale
+        band_sums -= band_powers
+        band_sums *= alpha
+        band_powers += band_sums
+        return flux
+    
+    def _onset_strength(env, norm_len, pre_max, pre_avg, threshold):
+        """Causal peak test on the newest envelope value.
+        
+        Returns its strength normalized to the last norm_len values, or -1.0
+        if it is not a local max over pre_max values that also clears the
+        pre_avg mean by threshold times the recent range.
+        """
+        value = env[-1]
+        recent = env[-norm_len:]
+        low = recent.min()
+        spread = recent.max() - low
+        if spread <= 1e-9:
+            return -1.0
+        if value < env[-1 - pre_max:-1].max():
+            return -1.0
+        if value < env[-1 - pre_avg:-1].mean() + threshold * spread:
+            return -1.0
+        return float((value - low) / spread)
+    
+    def _mean_beat_interval(times):
+        """Mean gap between consecutive beat times, ignoring gaps outside 0.5-2x the upper median.
+        
+        Returns 0.0 when fewer than two times are given or no gap survives.
+        """
+        intervals = np.diff(times)
+        if intervals.shape[0] == 0:
+            return 0.0
+        mid = intervals.shape[0] // 2
+        median = np.partition(intervals, mid)[mid]
+        valid = intervals[(intervals > median * 0.5) & (intervals < median * 2.0)]
+        return float(valid.mean()) if valid.shape[0] else 0.0
+
+def _aligned_zeros(n, dtype=np.float32, alignment=64):
+    """Zeroed 1-D array whose data starts on an alignment-byte boundary (cache line / SIMD width)."""
+    itemsize = np.dtype(dtype).itemsize
+    raw = np.zeros(n * itemsize + alignment, dtype=np.uint8)
+    offset = -raw.ctypes.data % alignment
+    return raw[offset:offset + n * itemsize].view(dtype)
+
 class AudioProcessor:
     def __init__(self, config):
         # Log available host APIs for debugging
@@ -48,22 +243,80 @@ class AudioProcessor:
         # Beat detection parameters
         self.onset_threshold = self.processing_config['beat_detection']['onset_threshold']
         self.hop_length = self.processing_config['beat_detection']['hop_length']
+        self.frame_length = self.processing_config['beat_detection'].get('frame_length', 4 * self.hop_length)
+        self.onset_method = self.processing_config['beat_detection'].get('method', 'spectral_flux')
+        if self.onset_method == 'librosa' and not LIBROSA_AVAILABLE:
+            logger.warning("librosa not available - using spectral-flux beat detection")
+            self.onset_method = 'spectral_flux'
+        self.min_tempo = self.processing_config['beat_detection']['min_tempo']
+        self.max_tempo = self.processing_config['beat_detection']['max_tempo']
+        
+        # Fixed arguments for the librosa beat fallback
+        self._librosa_kwargs = {'sr': self.sample_rate, 'hop_length': self.hop_length}
+        self._onset_detect_kwargs = {'delta': self.onset_threshold}
         
         # Frequency band definitions
         self.freq_bands = self.processing_config['frequency_bands']
         
+        # Band bin ranges for the per-hop real FFT (fixed, so computed once).
+        # One Hann-windowed transform per hop (a short-time Fourier transform
+        # with overlapping frames) feeds both band powers and onsets. The length
+        # is rounded up to a 2/3/5-smooth size so an odd frame_length cannot
+        # drop the transform onto a slow prime-size algorithm.
+        self._fft_n = next_fast_len(max(self.frame_length, self.hop_length), real=True)
+        self._window = signal.get_window('hann', self._fft_n).astype(np.float32)  # Periodic Hann, as for STFT frames
+        self._build_band_table()
+        
+        # Per-hop work buffers, reused every hop so the analysis path does not allocate.
+        # All float32 and 64-byte aligned so vectorized loads never straddle cache lines.
+        num_bins = self._fft_n // 2 + 1
+        self._windowed = _aligned_zeros(self._fft_n)
+        self._log_mag = _aligned_zeros(num_bins)
+        self._prev_log_mag = _aligned_zeros(num_bins)
+        self._flux_diff = _aligned_zeros(num_bins)
+        self._band_sums = np.empty(len(self._band_names), dtype=np.float32)
+        self._setup_hop_fft()
+        
+        # Flux compression log1p(gamma * |X|) on magnitudes scaled so a full-scale
+        # sine peaks at 1.0: with gamma = 10 bins below about -20 dBFS stay nearly
+        # linear, so broadband background noise does not swamp the onset
+        # envelope, while loud tonal content is still compressed
+        self._flux_gain = np.float32(10.0 * 2.0 / self._window.sum())
+        
+        # Band powers are an exponential average of per-hop frames (~0.25 s time constant)
+        self._band_alpha = np.float32(1.0 - math.exp(-self.hop_length / (0.25 * self.sample_rate)))
+        
         # Volume processing
         self.volume_smoothing = self.processing_config['volume']['smoothing_factor']
         self.volume_gain = self.processing_config['volume']['gain']
         self.noise_floor = self.processing_config['volume']['noise_floor']
         
-        # Audio buffers and state
-        self.audio_buffer = deque(maxlen=self.sample_rate * 4)  # 4 seconds buffer
+        # Audio ring buffer (4 seconds of mono float32), filled by the processing
+        # thread's blocking reads; _ring_widx counts total samples written and is
+        # only ever advanced after the copy lands. The ring is stored twice back
+        # to back (every sample is mirrored), so any window of up to _ring_size
+        # samples is a contiguous slice and reads never have to stitch two parts.
+        self._ring_size = self.sample_rate * 4
+        self._ring = _aligned_zeros(2 * self._ring_size)
+        self._ring_widx = 0
+        self._downmix = np.array([0.5, 0.5], dtype=np.float32)  # Stereo -> mono weights
+        self._mono = _aligned_zeros(self.hop_length)  # Downmix target for each read
+        
+        # The processing thread reads one hop at a time; the whole-window
+        # analyses run every _analysis_hops hops (~30 times per second)
+        self._analysis_hops = max(1, int(round(self.sample_rate / (30 * self.hop_length))))
+        
+        # Audio state
         self.current_volume = 0.0
         self.smoothed_volume = 0.0
         self.beat_detected = False
         self.beat_strength = 0.0
-        self.frequency_powers = {'bass': 0.0, 'mid': 0.0, 'treble': 0.0}
+        self._band_powers = np.zeros(len(self._band_names), dtype=np.float32)
+        self.frequency_powers = BandPowers(self._band_names, self._band_powers)
+        
+        # get_audio_features() copies into a preallocated AudioFeatures per
+        # calling thread, so the effects loop and the UI never share one
+        self._thread_features = threading.local()
         
         # Threading
         self.running = False
@@ -71,14 +324,102 @@ class AudioProcessor:
         self.processing_thread = None
         
         # Beat detection state
-        self.onset_times = deque(maxlen=100)
+        self._onset_buf = np.zeros(100, dtype=np.float64)  # Ring of recent beat times
+        self._onset_count = 0  # Total beats registered; the write index is this modulo 100
+        self._recent_onsets = np.empty(8, dtype=np.float64)  # Scratch for tempo estimation
         self.last_beat_time = 0
+        self._last_beat_monotonic = 0.0
+        self._last_beat_log = 0.0
+        
+        # Log throttling state
+        self._last_overflow_warning = 0.0
+        self._last_volume_log = 0.0
+        self._block_count = 0
         self.tempo = 120  # BPM
         
+        # Causal spectral-flux onset detector state (one frame per hop)
+        hops_per_second = self.sample_rate / self.hop_length
+        self._hops_per_second = hops_per_second
+        self._flux_env = np.zeros(int(round(4 * hops_per_second)), dtype=np.float32)  # ~4 s for tempo
+        self._onset_norm_len = int(round(hops_per_second))  # Peak picking normalizes over ~1 s
+        self._onset_pre_max = max(1, int(round(0.03 * hops_per_second)))
+        self._onset_pre_avg = max(1, int(round(0.1 * hops_per_second)))
+        self._onset_wait = max(1, int(round(0.1 * hops_per_second)))
+        self._beat_hold_hops = max(1, int(round(0.033 * hops_per_second)))
+        self._hops_since_onset = self._onset_wait
+        self._hop_count = 0  # Hops analyzed so far
+        self._hop_energy = np.zeros(int(round(hops_per_second)), dtype=np.float64)  # Last ~1 s of per-hop sum of squares
+        self._onset_widx = 0  # Ring sample index of the last analyzed hop
+        
+        # Envelope autocorrelation lags (in hops) spanning the allowed tempo range
+        self._min_tempo_lag = max(1, int(math.floor(60.0 * hops_per_second / self.max_tempo)))
+        self._max_tempo_lag = int(math.ceil(60.0 * hops_per_second / self.min_tempo))
+        
+        # Log-normal prior around 120 BPM (as in librosa's tempo estimator) to
+        # break ties between a tempo and its half/double
+        lags = np.arange(self._max_tempo_lag + 2, dtype=np.float32)
+        lag_bpm = 60.0 * hops_per_second / np.maximum(lags, 1.0)
+        self._tempo_prior = np.exp(-0.5 * np.log2(lag_bpm / 120.0) ** 2).astype(np.float32)
+        
+        # Compile the Numba kernels now rather than on the first hop of audio
+        if NUMBA_AVAILABLE:
+            _window_energy(self._ring_read(self._fft_n), self._window, self._windowed, self._fft_n - self.hop_length)
+            _spectrum_features(np.zeros(self._log_mag.shape[0], dtype=np.complex64),
+                               self._log_mag, self._prev_log_mag, self._flux_diff, self._flux_gain,
+                               self._band_bins, self._band_scale, self._band_alpha,
+                               self._band_sums, self._band_powers)
+            _mean_beat_interval(self._recent_onsets)
+            _onset_strength(self._flux_env, self._onset_norm_len, self._onset_pre_max,
+                            self._onset_pre_avg, self.onset_threshold)
+        
         # Initialize audio stream
         self.audio_stream = None
         self._setup_audio_device()
     
+    def _build_band_table(self):
+        """Precompute per-band FFT bin ranges and mean-power scales."""
+        # Bin k sits at k * sample_rate / n, so each inclusive [low, high] band
+        # maps straight to a bin range without materializing a frequency array
+        num_bins = self._fft_n // 2 + 1
+        bins_per_hz = self._fft_n / self.sample_rate
+        
+        self._band_slices = {}
+        for band_name, (low_freq, high_freq) in self.freq_bands.items():
+            # Round away float noise so band edges that land exactly on a bin stay inclusive
+            lo_bin = round(low_freq * bins_per_hz, 6)
+            hi_bin = round(high_freq * bins_per_hz, 6)
+            lo_idx = min(num_bins, max(0, int(math.ceil(lo_bin))))
+            hi_idx = min(num_bins, max(0, int(math.floor(hi_bin)) + 1))
+            self._band_slices[band_name] = (lo_idx, hi_idx)
+        
+        # (start, stop) bin pairs as one array for the spectrum kernel. Empty
+        # bands get a zero scale.
+        self._band_names = tuple(self._band_slices)
+        self._band_bins = np.array([self._band_slices[band] for band in self._band_names], dtype=np.intp)
+        widths = np.array([hi - lo for lo, hi in self._band_slices.values()], dtype=np.float32)
+        self._band_scale = np.divide(1.0, widths, out=np.zeros_like(widths), where=widths > 0)
+    
+    def _setup_hop_fft(self):
+        """Plan the per-hop FFT once with pyFFTW, if available."""
+        self._hop_fft = None
+        if not PYFFTW_AVAILABLE:
+            return
+        
+        try:
+            self._fft_in = pyfftw.empty_aligned(self._fft_n, dtype='float32')
+            self._fft_out = pyfftw.empty_aligned(self._fft_n // 2 + 1, dtype='complex64')
+            self._fft_in[:] = 0.0
+            # A hop-sized transform is too small to gain from extra threads
+            self._hop_fft = pyfftw.FFTW(
+                self._fft_in, self._fft_out,
+                flags=('FFTW_MEASURE',),
+                threads=1
+            )
+            logger.info(f"Planned {self._fft_n}-point hop FFT with pyFFTW")
+        except Exception as e:
+            logger.warning(f"pyFFTW planning failed, using scipy.fft: {e}")
+            self._hop_fft = None
+    
     def _probe_audio_device(self, device_id, device_info, test_channels):
         """Test if a specific audio device actually works."""
         try:
@@ -148,46 +489,24 @@ class AudioProcessor:
             # Show ALSA vs sounddevice comparison
             self._run_alsa_diagnostics()
             
-            # Run the PyAudio device index check from Stack Overflow
-            logger.info("=== PYAUDIO-STYLE DEVICE INDEX CHECK ===")
-            try:
-                for i in range(len(sd.query_devices())):
-                    dev = sd.query_devices(i)
-                    logger.info(f"Index {i}: {dev['name']} (inputs: {dev['max_input_channels']})")
-            except Exception as e:
-                logger.warning(f"Device index check failed: {e}")
-            
-            # Get all sounddevice devices
+            # Query the device list once; every strategy below works from this snapshot
             devices = sd.query_devices()
             logger.info("=== SOUNDDEVICE DEVICE ANALYSIS ===")
             
+            # One pass: log each device and sort it into the candidate lists
+            sound_blaster_match = re.compile(r'sound blaster|creative|blaster|s3').search
             sound_blaster_devices = []
             input_devices = []
-            
             for i, device in enumerate(devices):
-                inputs = device['max_input_channels']
-                outputs = device['max_output_channels']
-                hostapi = device['hostapi']
-                name = device['name']
-                
-                # Check if it's a Sound Blaster
-                name_lower = name.lower()
-                is_sound_blaster = any(term in name_lower for term in 
-                                     ['sound blaster', 'creative', 'blaster', 's3'])
-                
-                logger.info(f"Device {i}: {name}")
-                logger.info(f"  Inputs: {inputs}, Outputs: {outputs}, Host API: {hostapi}")
-                logger.info(f"  Sample Rate: {device['default_samplerate']}")
-                
-                if is_sound_blaster:
+                logger.info(
+                    f"Device {i}: {device['name']} (inputs: {device['max_input_channels']}, "
+                    f"outputs: {device['max_output_channels']}, host API: {device['hostapi']}, "
+                    f"rate: {device['default_samplerate']})"
+                )
+                if sound_blaster_match(device['name'].lower()):
                     sound_blaster_devices.append((i, device))
-                    logger.info(f"  *** SOUND BLASTER DETECTED ***")
-                
-                if inputs > 0:
+                if device['max_input_channels'] > 0:
                     input_devices.append((i, device))
-                    logger.info(f"  *** HAS INPUT CHANNELS ***")
-                
-                logger.info("")
             
             # Report findings
             logger.info(f"Found {len(sound_blaster_devices)} Sound Blaster device(s)")
@@ -239,9 +558,10 @@ class AudioProcessor:
             
             # Strategy 3: Try any input device
             logger.info("=== TESTING ALL INPUT DEVICES ===")
+            tested_ids = {device_id for device_id, _ in sound_blaster_devices}
             for device_id, device_info in input_devices:
                 # Skip if already tested as Sound Blaster
-                if (device_id, device_info) in sound_blaster_devices:
+                if device_id in tested_ids:
                     continue
                     
                 logger.info(f"Testing input device {device_id}: {device_info['name']}")
@@ -291,57 +611,80 @@ class AudioProcessor:
             self.device_id = None
             self.input_channels = 2
     
-    def _audio_callback(self, indata, frames, time_info, status):
-        """Callback function for audio stream."""
-        if status:
-            # Only log overflow warnings occasionally to avoid spam
-            if hasattr(status, 'input_overflow') and status.input_overflow:
-                if not hasattr(self, '_last_overflow_warning'):
-                    self._last_overflow_warning = 0
-                import time
-                current_time = time.time()
-                if current_time - self._last_overflow_warning > 30:  # Only warn every 30 seconds
-                    logger.warning(f"Audio input overflow detected - consider increasing buffer size")
-                    self._last_overflow_warning = current_time
-            elif status:
-                logger.warning(f"Audio callback status: {status}")
+    def _warn_overflow(self):
+        """Log input overflows at most every 30 seconds to avoid spam."""
+        current_time = time.monotonic()
+        if current_time - self._last_overflow_warning > 30:  # Only warn every 30 seconds
+            logger.warning("Audio input overflow detected - consider increasing buffer size")
+            self._last_overflow_warning = current_time
+    
+    def _ingest_audio(self, indata):
+        """Downmix a block read from the input stream and append it to the ring buffer."""
+        # Fast audio processing for the read path
+        if len(indata) == 0:
+            return
         
-        try:
-            # Fast audio processing for callback efficiency
-            if len(indata) == 0:
-                return
-            
-            # Convert to mono efficiently
-            if self.input_channels == 2 and indata.ndim > 1 and indata.shape[1] >= 2:
-                # Use left channel only (faster than averaging)
-                audio_data = indata[:, 0]
-            elif indata.ndim > 1:
-                audio_data = indata[:, 0] if indata.shape[1] > 0 else indata.flatten()
+        # Convert to mono efficiently
+        if self.input_channels == 2 and indata.ndim > 1 and indata.shape[1] == 2:
+            # Average both channels with a single (frames, 2) @ (2,) product,
+            # written into the preallocated mono buffer when the block fits
+            frames = indata.shape[0]
+            if frames <= self._mono.shape[0] and indata.dtype == np.float32:
+                audio_data = np.matmul(indata, self._downmix, out=self._mono[:frames])
             else:
-                audio_data = indata
-            
-            # Quick level check (sample every 10th callback to reduce overhead)
-            if not hasattr(self, '_callback_count'):
-                self._callback_count = 0
-            self._callback_count += 1
+                audio_data = indata @ self._downmix
+        elif indata.ndim > 1:
+            audio_data = indata[:, 0] if indata.shape[1] > 1 else indata.reshape(-1)
+        else:
+            audio_data = indata
+        
+        # Quick level check (every 10th block, and only when debug logging is on)
+        if logger.isEnabledFor(logging.DEBUG):
+            self._block_count += 1
             
-            if self._callback_count % 10 == 0:
+            if self._block_count % 10 == 0:
                 audio_level = np.abs(audio_data).mean()
                 if audio_level > 0.001:
-                    logger.debug(f"Audio level: {audio_level:.4f}")
-            
-            # Smart buffer management - only add if buffer isn't too full
-            buffer_usage = len(self.audio_buffer) / self.audio_buffer.maxlen
-            if buffer_usage < 0.8:  # Only fill to 80% to prevent overflow
-                self.audio_buffer.extend(audio_data)
-            elif buffer_usage > 0.95:
-                # Emergency: drop some old data to make room
-                drop_amount = int(self.audio_buffer.maxlen * 0.1)
-                for _ in range(min(drop_amount, len(self.audio_buffer))):
-                    self.audio_buffer.popleft()
-                
-        except Exception as e:
-            logger.error(f"Error in audio callback: {e}")
+                    logger.debug("Audio level: %.4f", audio_level)
+        
+        # Overwrite-oldest ring write (no allocation, no fill gating)
+        self._ring_write(audio_data)
+    
+    def _ring_write(self, audio_data):
+        """Copy a block of mono samples into the ring buffer and its mirror."""
+        ring = self._ring
+        size = self._ring_size
+        total = audio_data.shape[0]
+        n = total
+        if n > size:
+            audio_data = audio_data[-size:]
+            n = size
+        
+        # [start, end) never runs past the mirror half, so the block lands in one
+        # copy; the second copy fills in the other half's image of the same samples
+        start = (self._ring_widx + total - n) % size
+        end = start + n
+        ring[start:end] = audio_data
+        if end <= size:
+            ring[start + size:end + size] = audio_data
+        else:
+            split = size - start
+            ring[start + size:] = audio_data[:split]
+            ring[:end - size] = audio_data[split:]
+        
+        # Publish only after the samples are in place
+        self._ring_widx += total
+    
+    def _ring_read(self, num_samples, end=None):
+        """Return a view of the most recent num_samples ending at sample index end.
+        
+        The view is zero-copy and stays valid until those samples are overwritten
+        (the ring holds 4 seconds); only the processing thread writes the ring.
+        """
+        if end is None:
+            end = self._ring_widx
+        start = (end - num_samples) % self._ring_size
+        return self._ring[start:start + num_samples]
     
     def start(self):
         """Start audio processing."""
@@ -356,10 +699,12 @@ class AudioProcessor:
             stream_params = {
                 'channels': self.input_channels,
                 'samplerate': self.sample_rate,
-                'blocksize': self.buffer_size,
-                'callback': self._audio_callback,
+                # Small host periods so each hop is delivered as soon as it is
+                # captured; the large buffer_size-deep host buffer still absorbs
+                # processing stalls for Raspberry Pi stability
+                'blocksize': self.hop_length,
                 'dtype': np.float32,
-                'latency': 'high'  # High latency for Raspberry Pi stability
+                'latency': self.buffer_size / self.sample_rate
             }
             
             # Add device parameter if we have a specific device
@@ -384,7 +729,7 @@ class AudioProcessor:
                         device=self.device_id,
                         channels=min(self.input_channels, 2),
                         samplerate=44100,
-                        callback=self._audio_callback
+                        dtype=np.float32
                     )
                     logger.info(f"✓ Created fallback stream with device {self.device_id}")
                 else:
@@ -392,7 +737,7 @@ class AudioProcessor:
                     self.audio_stream = sd.InputStream(
                         channels=2,
                         samplerate=44100,
-                        callback=self._audio_callback
+                        dtype=np.float32
                     )
                     logger.info("✓ Created minimal fallback stream")
                     
@@ -412,13 +757,14 @@ class AudioProcessor:
         """Stop audio processing."""
         self.running = False
         
+        # The processing thread returns after its current blocking read
+        if self.processing_thread:
+            self.processing_thread.join()
+        
         if self.audio_stream:
             self.audio_stream.stop()
             self.audio_stream.close()
         
-        if self.processing_thread:
-            self.processing_thread.join()
-        
         logger.info("Audio processing stopped")
     
     def get_status(self):
@@ -452,42 +798,73 @@ class AudioProcessor:
             
         return status
     
+    def _pin_processing_thread(self):
+        """Move the processing thread off the lowest-numbered core when three or more are usable.
+        
+        Only this thread is pinned; the main loop and DMX output thread keep
+        the default affinity and are scheduled freely by the OS.
+        """
+        if not hasattr(os, 'sched_setaffinity'):
+            return  # Linux only
+        try:
+            cores = os.sched_getaffinity(0)
+            if len(cores) < 3:
+                return
+            # With pid 0 this applies to the calling thread only
+            processing_cores = cores - {min(cores)}
+            os.sched_setaffinity(0, processing_cores)
+            logger.info("Pinned audio processing thread to cores %s", sorted(processing_cores))
+        except OSError as e:
+            logger.warning("Could not set processing thread affinity: %s", e)
+    
     def _processing_loop(self):
-        """Main processing loop for audio analysis."""
+        """Main processing loop: blocking stream reads feed the ring buffer and pace analysis."""
+        self._pin_processing_thread()
         process_counter = 0
+        hop_counter = 0
         while self.running:
             try:
-                # Check if we have enough audio data
-                buffer_len = len(self.audio_buffer)
-                if buffer_len < self.sample_rate // 2:  # Need at least 0.5 seconds
-                    time.sleep(0.02)
+                # Block until the next hop of audio arrives. The read returns as
+                # soon as hop_length new samples exist, so the thread only wakes
+                # when there is work and never sleep-polls.
+                indata, overflowed = self.audio_stream.read(self.hop_length)
+                if overflowed:
+                    self._warn_overflow()
+                self._ingest_audio(indata)
+                
+                # Band powers and onsets are tracked causally on every new hop
+                self._analyze_hops()
+                
+                hop_counter += 1
+                if hop_counter % self._analysis_hops:
                     continue
                 
-                # Use smaller chunks to reduce processing load
-                chunk_size = min(self.sample_rate, buffer_len)
-                audio_data = np.array(list(self.audio_buffer)[-chunk_size:])
+                # Check if we have enough audio data (at least 0.5 seconds)
+                if self._hop_count < self._hop_energy.shape[0] // 2:
+                    continue
                 
-                # Always process volume (lightweight)
-                self._analyze_volume(audio_data)
+                # Always process volume (lightweight: the energies come from the hop pass)
+                self._analyze_volume()
                 
                 # Process other features less frequently to reduce CPU load
                 process_counter += 1
-                if process_counter % 2 == 0:  # Every other iteration
-                    self._analyze_frequency_bands(audio_data)
-                if process_counter % 3 == 0:  # Every third iteration  
+                if self.onset_method == 'librosa' and process_counter % 3 == 0:  # Every third iteration
+                    buffer_len = min(self._ring_widx, self._ring_size)
+                    chunk_size = min(self.sample_rate, buffer_len)
+                    audio_data = self._ring_read(chunk_size)
                     self._detect_beats(audio_data)
                 
-                # Slower processing rate for Raspberry Pi
-                time.sleep(1.0 / 30)  # 30 FPS instead of 60
-                
             except Exception as e:
-                logger.error(f"Error in processing loop: {e}")
+                if not self.running:
+                    break
+                logger.error("Error in processing loop: %s", e)
                 time.sleep(0.1)
     
-    def _analyze_volume(self, audio_data):
-        """Analyze current volume level."""
-        # Calculate RMS volume
-        rms = np.sqrt(np.mean(audio_data ** 2))
+    def _analyze_volume(self):
+        """Analyze current volume level over the last second of hops."""
+        # RMS from the per-hop sums of squares gathered while windowing each hop
+        hops = min(self._hop_count, self._hop_energy.shape[0])
+        rms = math.sqrt(self._hop_energy.sum() / (hops * self.hop_length))
         
         # Apply gain and noise floor
         volume = max(rms * self.volume_gain, self.noise_floor)
@@ -499,91 +876,173 @@ class AudioProcessor:
         self.current_volume = volume
         
         # Log volume levels periodically for debugging
-        if not hasattr(self, '_last_volume_log'):
-            self._last_volume_log = 0
-        
-        current_time = time.time()
+        current_time = time.monotonic()
         if current_time - self._last_volume_log > 3:  # Every 3 seconds
-            logger.info(f"Audio levels - Raw RMS: {rms:.4f}, After gain ({self.volume_gain}x): {volume:.4f}, Smoothed: {self.smoothed_volume:.4f}")
+            logger.info(
+                "Audio levels - Raw RMS: %.4f, After gain (%sx): %.4f, Smoothed: %.4f",
+                rms, self.volume_gain, volume, self.smoothed_volume
+            )
             if rms < 0.0001:
                 logger.warning("Very low audio levels detected - check audio input source and volume")
             self._last_volume_log = current_time
     
-    def _analyze_frequency_bands(self, audio_data):
-        """Analyze power in different frequency bands."""
-        # Compute FFT
-        fft = np.fft.fft(audio_data)
-        freqs = np.fft.fftfreq(len(audio_data), 1/self.sample_rate)
+    def _analyze_hops(self):
+        """Analyze every hop received since the last call (band powers and onsets)."""
+        hop = self.hop_length
+        widx = self._ring_widx
         
-        # Get magnitude spectrum
-        magnitude = np.abs(fft)
+        # If we fell further behind than the ring holds, resume at the newest hop
+        if widx - self._onset_widx > self._ring_size:
+            self._onset_widx = widx - hop
         
-        # Calculate power in each frequency band
-        for band_name, (low_freq, high_freq) in self.freq_bands.items():
-            # Find frequency indices
-            freq_mask = (freqs >= low_freq) & (freqs <= high_freq)
-            
-            # Calculate average power in band
-            if np.any(freq_mask):
-                power = np.mean(magnitude[freq_mask])
-                self.frequency_powers[band_name] = power
-            else:
-                self.frequency_powers[band_name] = 0.0
+        while widx - self._onset_widx >= hop:
+            self._onset_widx += hop
+            self._analyze_hop(self._ring_read(self._fft_n, end=self._onset_widx))
+        
+        # Hold the beat flag for a few hops so ~60 Hz consumers cannot miss it
+        if self.onset_method != 'librosa':
+            self.beat_detected = self._hops_since_onset < self._beat_hold_hops
+    
+    def _analyze_hop(self, frame):
+        """Transform the Hann-windowed frame ending at the newest hop and feed the band and onset analyses."""
+        # Windowing and the volume energy (of the newest hop only) share one pass over the frame
+        fft_in = self._fft_in if self._hop_fft is not None else self._windowed
+        energy = _window_energy(frame, self._window, fft_in, self._fft_n - self.hop_length)
+        self._hop_energy[self._hop_count % self._hop_energy.shape[0]] = energy
+        self._hop_count += 1
+        
+        if self._hop_fft is not None:
+            spectrum = self._hop_fft()
+        else:
+            spectrum = rfft(self._windowed, overwrite_x=True)
+        
+        # Band powers (updated in place in the array behind self.frequency_powers)
+        # and the half-wave rectified log-magnitude flux come out of one pass; log
+        # compression keeps quiet passages from being swamped by loud ones
+        flux = _spectrum_features(spectrum, self._log_mag, self._prev_log_mag, self._flux_diff, self._flux_gain,
+                                  self._band_bins, self._band_scale, self._band_alpha,
+                                  self._band_sums, self._band_powers)
+        
+        # Swap buffers: this hop's spectrum becomes the reference for the next
+        self._prev_log_mag, self._log_mag = self._log_mag, self._prev_log_mag
+        
+        if self.onset_method != 'librosa':
+            self._onset_from_flux(flux)
+    
+    def _onset_from_flux(self, flux):
+        """Append one hop's flux to the onset envelope and peak-pick its newest value."""
+        env = self._flux_env
+        env[:-1] = env[1:]
+        env[-1] = flux
+        self._hops_since_onset += 1
+        
+        # Causal peak picking: local max over the previous few hops, above the
+        # recent average by onset_threshold (relative to the last second's range)
+        if self._hops_since_onset < self._onset_wait:
+            return False
+        strength = _onset_strength(env, self._onset_norm_len, self._onset_pre_max,
+                                   self._onset_pre_avg, self.onset_threshold)
+        if strength < 0:
+            return False
+        
+        self._hops_since_onset = 0
+        self._register_beat(strength)
+        self._estimate_tempo_from_envelope()
+        return True
+    
+    def _estimate_tempo_from_envelope(self):
+        """Estimate tempo from the autocorrelation peak of the onset envelope."""
+        env = self._flux_env
+        if self._onset_widx < env.shape[0] * self.hop_length:
+            return  # Envelope not filled yet
+        
+        centered = env - env.mean()
+        autocorr = np.correlate(centered, centered, mode='full')[env.shape[0] - 1:]
+        
+        lo, hi = self._min_tempo_lag, min(self._max_tempo_lag, autocorr.shape[0] - 2)
+        if hi <= lo:
+            return
+        lag = lo + int(np.argmax(autocorr[lo:hi + 1] * self._tempo_prior[lo:hi + 1]))
+        if autocorr[lag] <= 0:
+            return
+        
+        # Parabolic interpolation around the peak for sub-hop lag resolution
+        left, peak, right = autocorr[lag - 1], autocorr[lag], autocorr[lag + 1]
+        denom = left - 2 * peak + right
+        offset = 0.5 * (left - right) / denom if denom < 0 else 0.0
+        
+        calculated_tempo = 60.0 * self._hops_per_second / (lag + offset)
+        self.tempo = np.clip(
+            calculated_tempo,
+            self.min_tempo,
+            self.max_tempo
+        )
+    
+    def _register_beat(self, strength):
+        """Record a detected beat."""
+        # Beat intervals use the monotonic clock; last_beat_time stays wall-clock for status reports
+        current_time = time.monotonic()
+        self.beat_detected = True
+        self.last_beat_time = time.time()
+        self._last_beat_monotonic = current_time
+        self.beat_strength = strength
+        
+        self._onset_buf[self._onset_count % self._onset_buf.shape[0]] = current_time
+        self._onset_count += 1
+        
+        # Throttle to one line per second; beats can arrive several times a second
+        if current_time - self._last_beat_log >= 1.0 and logger.isEnabledFor(logging.INFO):
+            logger.info("Beat detected! Strength: %.3f, Total beats: %d", self.beat_strength, self._onset_count)
+            self._last_beat_log = current_time
+    
+    def _recent_onset_times(self):
+        """Copy the most recent (up to 8) beat times, oldest first, into the scratch array."""
+        buf = self._onset_buf
+        n = min(self._recent_onsets.shape[0], self._onset_count)
+        end = self._onset_count % buf.shape[0]
+        start = end - n
+        out = self._recent_onsets[:n]
+        if start >= 0:
+            out[:] = buf[start:end]
+        else:
+            out[:-start] = buf[start:]
+            out[-start:] = buf[:end]
+        return out
     
     def _detect_beats(self, audio_data):
-        """Detect beats using onset detection."""
+        """Detect beats over the whole window using librosa onset detection."""
         try:
+            # Compute the onset envelope once and share it between peak picking
+            # and beat strength (each librosa call would otherwise redo the STFT)
+            onset_envelope = librosa.onset.onset_strength(y=audio_data, **self._librosa_kwargs)
+            
             # Use librosa for onset detection (handle different parameter names)
             try:
-                # Try with newer librosa parameter name
                 onset_frames = librosa.onset.onset_detect(
-                    y=audio_data,
-                    sr=self.sample_rate,
-                    hop_length=self.hop_length,
-                    delta=self.onset_threshold,
-                    units='frames'
+                    onset_envelope=onset_envelope,
+                    units='frames',
+                    **self._librosa_kwargs,
+                    **self._onset_detect_kwargs
                 )
             except TypeError:
-                # Fallback to older librosa parameter name
+                if 'threshold' in self._onset_detect_kwargs:
+                    raise
+                # Older librosa names the peak-picking threshold 'threshold'; remember it
+                self._onset_detect_kwargs = {'threshold': self.onset_threshold}
                 onset_frames = librosa.onset.onset_detect(
-                    y=audio_data,
-                    sr=self.sample_rate,
-                    hop_length=self.hop_length,
-                    threshold=self.onset_threshold,
-                    units='frames'
+                    onset_envelope=onset_envelope,
+                    units='frames',
+                    **self._librosa_kwargs,
+                    **self._onset_detect_kwargs
                 )
             
             if len(onset_frames) > 0:
-                # Convert frames to time
-                onset_times = librosa.frames_to_time(
-                    onset_frames, 
-                    sr=self.sample_rate, 
-                    hop_length=self.hop_length
-                )
-                
-                # Check for recent beats
-                current_time = time.time()
-                recent_beats = onset_times[onset_times > (len(audio_data)/self.sample_rate - 0.1)]
+                # Only the newest onset matters: is it within the last 100 ms of the window?
+                cutoff_frame = (audio_data.shape[0] - int(0.1 * self.sample_rate)) // self.hop_length
                 
-                if len(recent_beats) > 0:
-                    # Beat detected
-                    self.beat_detected = True
-                    self.last_beat_time = current_time
-                    
-                    # Calculate beat strength based on onset strength
-                    onset_strength = librosa.onset.onset_strength(
-                        y=audio_data,
-                        sr=self.sample_rate,
-                        hop_length=self.hop_length
-                    )
-                    
-                    if len(onset_strength) > 0:
-                        self.beat_strength = np.max(onset_strength[-10:])  # Recent strength
-                    
-                    logger.info(f"Beat detected! Strength: {self.beat_strength:.3f}, Total beats: {len(self.onset_times) + 1}")
-                    
-                    # Update tempo estimation
-                    self.onset_times.append(current_time)
+                if onset_frames[-1] > cutoff_frame:
+                    # Beat detected, strength based on recent onset strength
+                    self._register_beat(np.max(onset_envelope[-10:]))
                     self._estimate_tempo()
                 else:
                     self.beat_detected = False
@@ -591,61 +1050,135 @@ class AudioProcessor:
                 self.beat_detected = False
                 
         except Exception as e:
-            logger.error(f"Error in beat detection: {e}")
+            logger.error("Error in beat detection: %s", e)
             self.beat_detected = False
     
     def _estimate_tempo(self):
         """Estimate current tempo from recent beats."""
-        logger.info(f"Tempo estimation: {len(self.onset_times)} beats recorded")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Tempo estimation: %d beats recorded", self._onset_count)
         
-        if len(self.onset_times) < 2:
-            logger.info("Not enough beats for tempo estimation (need at least 2)")
+        if self._onset_count < 2:
+            if debug:
+                logger.debug("Not enough beats for tempo estimation (need at least 2)")
             return
         
-        # Calculate intervals between beats
-        recent_onsets = list(self.onset_times)[-8:]  # Last 8 beats
-        intervals = np.diff(recent_onsets)
-        
-        logger.info(f"Beat intervals: {intervals}")
+        # Mean of the recent beat intervals after outlier rejection
+        recent_onsets = self._recent_onset_times()  # Last 8 beats
+        if debug:
+            logger.debug("Beat intervals: %s", np.diff(recent_onsets))
         
-        if len(intervals) > 0:
-            # Filter out outliers
-            median_interval = np.median(intervals)
-            valid_intervals = intervals[
-                (intervals > median_interval * 0.5) & 
-                (intervals < median_interval * 2.0)
-            ]
+        avg_interval = _mean_beat_interval(recent_onsets)
+        if avg_interval > 0:
+            calculated_tempo = 60.0 / avg_interval  # Convert to BPM
+            if debug:
+                logger.debug("Calculated tempo: %.1f BPM (from avg interval: %.3fs)", calculated_tempo, avg_interval)
             
-            logger.info(f"Valid intervals after filtering: {valid_intervals}")
+            # Clamp to reasonable range
+            self.tempo = np.clip(
+                calculated_tempo,
+                self.min_tempo,
+                self.max_tempo
+            )
             
-            if len(valid_intervals) > 0:
-                avg_interval = np.mean(valid_intervals)
-                calculated_tempo = 60.0 / avg_interval  # Convert to BPM
-                
-                logger.info(f"Calculated tempo: {calculated_tempo:.1f} BPM (from avg interval: {avg_interval:.3f}s)")
-                
-                # Clamp to reasonable range
-                self.tempo = np.clip(
-                    calculated_tempo,
-                    self.processing_config['beat_detection']['min_tempo'],
-                    self.processing_config['beat_detection']['max_tempo']
-                )
-                
-                logger.info(f"Final tempo (after clipping): {self.tempo:.1f} BPM")
+            if debug:
+                logger.debug("Final tempo (after clipping): %.1f BPM", self.tempo)
     
     def get_audio_features(self):
-        """Get current audio analysis features."""
-        return {
-            'volume': self.current_volume,
-            'smoothed_volume': self.smoothed_volume,
-            'beat_detected': self.beat_detected,
-            'beat_strength': self.beat_strength,
-            'tempo': self.tempo,
-            'frequency_powers': self.frequency_powers.copy(),
-            'time_since_beat': time.time() - self.last_beat_time
-        }
+        """Snapshot the current audio analysis features.
+        
+        The values are copied into an AudioFeatures owned by the calling thread,
+        which is reused (and overwritten) by that thread's next call.
+        """
+        features = getattr(self._thread_features, 'features', None)
+        if features is None:
+            features = self._thread_features.features = AudioFeatures(self._band_names)
+        features._capture(self)
+        return features
     
     def is_running(self):
         """Check if audio processing is running."""
         return self.running
 
+
+class AudioFeatures(Mapping):
+    """Snapshot of the audio analysis results for one consumer frame.
+    
+    get_audio_features() copies the processor's scalars and band powers into
+    a preallocated instance, so the 60 Hz consumers see one consistent set
+    of values per frame (the processing thread keeps updating every hop)
+    without allocating a dict per frame. Mapping access (features['tempo'],
+    features.get('tempo', 0)) is kept for the effects engine and UI; use
+    snapshot() when a copy must outlive the next get_audio_features() call.
+    """
+    
+    __slots__ = ('volume', 'smoothed_volume', 'beat_detected', 'beat_strength',
+                 'tempo', 'time_since_beat', 'frequency_powers', '_bands')
+    
+    _KEYS = ('volume', 'smoothed_volume', 'beat_detected', 'beat_strength',
+             'tempo', 'frequency_powers', 'time_since_beat')
+    
+    def __init__(self, band_names):
+        self.volume = 0.0
+        self.smoothed_volume = 0.0
+        self.beat_detected = False
+        self.beat_strength = 0.0
+        self.tempo = 0.0
+        self.time_since_beat = 0.0
+        self._bands = np.zeros(len(band_names), dtype=np.float32)
+        self.frequency_powers = BandPowers(band_names, self._bands)
+    
+    def _capture(self, processor):
+        """Copy the processor's current results into this instance."""
+        self.volume = processor.current_volume
+        self.smoothed_volume = processor.smoothed_volume
+        self.beat_detected = processor.beat_detected
+        self.beat_strength = processor.beat_strength
+        self.tempo = processor.tempo
+        self.time_since_beat = time.monotonic() - processor._last_beat_monotonic
+        np.copyto(self._bands, processor._band_powers)
+    
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __iter__(self):
+        return iter(self._KEYS)
+    
+    def __len__(self):
+        return len(self._KEYS)
+    
+    def snapshot(self):
+        """Return a detached dict copy of these features."""
+        features = {key: getattr(self, key) for key in self._KEYS}
+        features['frequency_powers'] = dict(features['frequency_powers'])
+        return features
+
+
+class BandPowers(Mapping):
+    """Read-only name -> power view over the band power array.
+    
+    The analyzer writes band powers into a float32 array in place; this keeps
+    the dict-style access (powers['bass'], powers.get('mid', 0)) that the
+    effects engine and UI use without rebuilding a dict.
+    """
+    
+    __slots__ = ('_index', '_values')
+    
+    def __init__(self, names, values):
+        self._index = {name: i for i, name in enumerate(names)}
+        self._values = values
+    
+    def __getitem__(self, key):
+        return float(self._values[self._index[key]])
+    
+    def __iter__(self):
+        return iter(self._index)
+    
+    def __len__(self):
+        return len(self._index)
+    
+    def __repr__(self):
+        return f"BandPowers({dict(self)})"
@@ -18,6 +18,20 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Unchanged frames are still resent at this interval (s) so fixtures that
+# blank on DMX signal loss keep their state
+DMX_KEEPALIVE_INTERVAL = 0.5
+
+# Enttec DMX USB Pro widget message framing
+ENTTEC_PRO_START = 0x7E
+ENTTEC_PRO_END = 0xE7
+ENTTEC_PRO_SEND_DMX = 6
+
+
+def _clamp_byte(value):
+    """Clamp a channel value to the DMX range 0-255."""
+    return value if 0 <= value <= 255 else (0 if value < 0 else 255)
+
 class DMXController:
     def __init__(self, config):
         self.config = config['dmx']
@@ -27,9 +41,11 @@ class DMXController:
         self.interface_port = self.config['interface']
         self.universe = self.config['universe']
         self.refresh_rate = self.config['refresh_rate']
+        self.interface_type = self.config.get('interface_type', 'auto')
         
-        # DMX universe data (512 channels)
-        self.dmx_data = [0] * 512
+        # DMX frame buffer: start code (0x00) at index 0, channels 1-512 at their
+        # own index, so the whole buffer goes to the interface without copying
+        self.dmx_data = bytearray(513)
         
         # Light fixture tracking
         self.lights = {}
@@ -37,6 +53,7 @@ class DMXController:
         
         # Serial connection
         self.serial_connection = None
+        self._pro_packet = None
         self.running = False
         self.output_thread = None
         
@@ -52,6 +69,19 @@ class DMXController:
             light = ParLight(light_config)
             self.lights[light.name] = light
             logger.info(f"Initialized light: {light.name} at DMX address {light.dmx_address}")
+        
+        # Channel indices per color across the whole rig, so whole-rig updates
+        # are one indexed store into a uint8 view of the frame buffer
+        self._dmx_view = np.frombuffer(self.dmx_data, dtype=np.uint8)
+        self._red_idx = self._channel_index(0)
+        self._green_idx = self._channel_index(1)
+        self._blue_idx = self._channel_index(2)
+        self._intensity_idx = self._channel_index(3)
+    
+    def _channel_index(self, slot):
+        """Collect one ParLight.channel_numbers slot across the rig, skipping absent channels."""
+        return np.array([light.channel_numbers[slot] for light in self.lights.values()
+                         if light.channel_numbers[slot]], dtype=np.intp)
     
     def _setup_dmx_interface(self):
         """Setup DMX USB interface connection."""
@@ -74,6 +104,34 @@ class DMXController:
         except Exception as e:
             logger.error(f"Failed to connect to DMX interface: {e}")
             self.serial_connection = None
+            return
+        
+        if self._is_enttec_pro():
+            # Enttec DMX USB Pro: the widget generates BREAK/MAB itself and takes
+            # the frame as an "Output Only Send DMX" packet (label 6), so the
+            # header and end marker are built once and only the data is refreshed
+            data_length = len(self.dmx_data)
+            self._pro_packet = bytearray(
+                bytes([ENTTEC_PRO_START, ENTTEC_PRO_SEND_DMX, data_length & 0xFF, data_length >> 8])
+                + bytes(data_length) + bytes([ENTTEC_PRO_END])
+            )
+            logger.info("Using Enttec DMX USB Pro packet protocol")
+    
+    def _is_enttec_pro(self):
+        """Whether the interface speaks the Enttec DMX USB Pro widget protocol."""
+        if self.interface_type != 'auto':
+            return self.interface_type == 'enttec_pro'
+        
+        try:
+            from serial.tools import list_ports
+            for port in list_ports.comports():
+                if port.device == self.interface_port:
+                    description = f"{port.description} {port.product or ''}".upper()
+                    return 'DMX USB PRO' in description
+        except Exception as e:
+            logger.warning(f"Could not detect DMX interface type: {e}")
+        
+        return False
     
     def start(self):
         """Start DMX output thread."""
@@ -100,20 +158,31 @@ class DMXController:
     def _output_loop(self):
         """Main DMX output loop."""
         frame_time = 1.0 / self.refresh_rate
+        next_deadline = time.perf_counter()
+        
+        # Copy of the last frame put on the wire; comparing against it is one memcmp
+        last_sent = bytearray(len(self.dmx_data))
+        last_send_time = float('-inf')
         
         while self.running:
-            start_time = time.time()
-            
             try:
-                self._send_dmx_frame()
+                # Receivers latch the last frame, so identical frames are only
+                # repeated as a keepalive
+                if self.dmx_data != last_sent or next_deadline - last_send_time >= DMX_KEEPALIVE_INTERVAL:
+                    last_sent[:] = self.dmx_data
+                    self._send_dmx_frame()
+                    last_send_time = next_deadline
                 self.frame_count += 1
                 
-                # Maintain consistent frame rate
-                elapsed = time.time() - start_time
-                sleep_time = max(0, frame_time - elapsed)
+                # Pace against absolute deadlines so sleep overshoot does not
+                # accumulate; after an overrun, resync instead of bursting
+                next_deadline += frame_time
+                sleep_time = next_deadline - time.perf_counter()
                 
                 if sleep_time > 0:
                     time.sleep(sleep_time)
+                else:
+                    next_deadline -= sleep_time
                     
             except Exception as e:
                 logger.error(f"Error in DMX output loop: {e}")
@@ -127,6 +196,13 @@ class DMXController:
             return
         
         try:
+            if self._pro_packet is not None:
+                # One write; the widget handles DMX timing
+                self._pro_packet[4:-1] = self.dmx_data
+                self.serial_connection.write(self._pro_packet)
+                self.last_update_time = time.time()
+                return
+            
             # DMX512 frame format:
             # Break (88µs low) + Mark After Break (8µs high) + Start Code (0x00) + 512 data bytes
             
@@ -139,8 +215,7 @@ class DMXController:
             time.sleep(0.000008)  # 8 microseconds
             
             # Send start code and data
-            frame_data = bytes([0x00] + self.dmx_data)
-            self.serial_connection.write(frame_data)
+            self.serial_connection.write(self.dmx_data)
             
             self.last_update_time = time.time()
             
@@ -156,24 +231,23 @@ class DMXController:
         light = self.lights[light_name]
         
         # Clamp values to 0-255 range
-        red = max(0, min(255, red))
-        green = max(0, min(255, green))
-        blue = max(0, min(255, blue))
+        red = _clamp_byte(red)
+        green = _clamp_byte(green)
+        blue = _clamp_byte(blue)
         
         # Set DMX channels
-        if light.channels['red']:
-            self.dmx_data[light.channels['red'] - 1] = red
-        if light.channels['green']:
-            self.dmx_data[light.channels['green'] - 1] = green
-        if light.channels['blue']:
-            self.dmx_data[light.channels['blue'] - 1] = blue
-        
-        # Set intensity if provided and channel exists (check both old and new channel names)
-        if intensity is not None:
-            intensity_channel = light.channels.get('intensity') or light.channels.get('master_dimmer')
-            if intensity_channel:
-                intensity = max(0, min(255, intensity))
-                self.dmx_data[intensity_channel - 1] = intensity
+        red_channel, green_channel, blue_channel, intensity_channel, _ = light.channel_numbers
+        if red_channel:
+            self.dmx_data[red_channel] = red
+        if green_channel:
+            self.dmx_data[green_channel] = green
+        if blue_channel:
+            self.dmx_data[blue_channel] = blue
+        
+        # Set intensity if provided and channel exists (either 'intensity' or 'master_dimmer')
+        if intensity is not None and intensity_channel:
+            intensity = _clamp_byte(intensity)
+            self.dmx_data[intensity_channel] = intensity
         
         # Update light state
         light.current_rgb = (red, green, blue)
@@ -187,12 +261,12 @@ class DMXController:
             return
         
         light = self.lights[light_name]
-        intensity = max(0, min(255, intensity))
+        intensity = _clamp_byte(intensity)
         
-        # Check both old and new channel names for intensity
-        intensity_channel = light.channels.get('intensity') or light.channels.get('master_dimmer')
+        # Either 'intensity' or 'master_dimmer', resolved at fixture setup
+        intensity_channel = light.channel_numbers[3]
         if intensity_channel:
-            self.dmx_data[intensity_channel - 1] = intensity
+            self.dmx_data[intensity_channel] = intensity
             light.current_intensity = intensity
     
     def set_light_strobe(self, light_name: str, strobe_speed: int):
@@ -202,15 +276,32 @@ class DMXController:
             return
         
         light = self.lights[light_name]
-        strobe_speed = max(0, min(255, strobe_speed))
+        strobe_speed = _clamp_byte(strobe_speed)
         
-        if light.channels['strobe']:
-            self.dmx_data[light.channels['strobe'] - 1] = strobe_speed
+        strobe_channel = light.channel_numbers[4]
+        if strobe_channel:
+            self.dmx_data[strobe_channel] = strobe_speed
     
     def set_all_lights_rgb(self, red: int, green: int, blue: int, intensity: int = None):
         """Set RGB values for all lights."""
-        for light_name in self.lights:
-            self.set_light_rgb(light_name, red, green, blue, intensity)
+        red = _clamp_byte(red)
+        green = _clamp_byte(green)
+        blue = _clamp_byte(blue)
+        
+        self._dmx_view[self._red_idx] = red
+        self._dmx_view[self._green_idx] = green
+        self._dmx_view[self._blue_idx] = blue
+        
+        if intensity is not None:
+            intensity = _clamp_byte(intensity)
+            self._dmx_view[self._intensity_idx] = intensity
+        
+        # Update light state
+        rgb = (red, green, blue)
+        for light in self.lights.values():
+            light.current_rgb = rgb
+            if intensity is not None:
+                light.current_intensity = intensity
     
     def set_all_lights_intensity(self, intensity: int):
         """Set intensity for all lights."""
@@ -267,6 +358,17 @@ class ParLight:
         
         # Validate channel configuration
         self._validate_channels()
+        
+        # Resolved channel numbers for the setters (0 = not present; index 0 of
+        # the frame buffer is the start code, so it is never a valid target)
+        channels = self.channels
+        self.channel_numbers = (
+            channels.get('red') or 0,
+            channels.get('green') or 0,
+            channels.get('blue') or 0,
+            channels.get('intensity') or channels.get('master_dimmer') or 0,
+            channels.get('strobe') or 0,
+        )
     
     def _validate_channels(self):
         """Validate DMX channel configuration."""
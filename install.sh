@@ -27,6 +27,7 @@ sudo apt install -y \
     python3-dev \
     python3-venv \
     portaudio19-dev \
+    libfftw3-dev \
     libasound2-dev \
     alsa-utils \
     pulseaudio \
@@ -56,6 +57,12 @@ pip install --upgrade pip
 echo "📚 Installing Python dependencies..."
 pip install -r requirements.txt
 
+# Optional accelerators; audio analysis falls back to numpy/scipy without them,
+# so a failed build here must not abort the install
+echo "⚡ Installing optional accelerators..."
+pip install "numba>=0.56.0" || echo "⚠️  numba not installed - using numpy analysis kernels"
+pip install "pyfftw>=0.12.0" || echo "⚠️  pyfftw not installed - using scipy.fft"
+
 # Setup udev rules for USB devices
 echo "⚙️  Setting up USB device permissions..."
 sudo tee /etc/udev/rules.d/99-dmx-usb.rules > /dev/null << 'EOF'
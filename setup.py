@@ -32,6 +32,10 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=requirements,
+    extras_require={
+        "librosa": ["librosa>=0.9.0"],
+        "speedups": ["numba>=0.56.0", "pyfftw>=0.12.0"],
+    },
     entry_points={
         "console_scripts": [
             "dmx-lightshow=main:main",